@@ -0,0 +1,222 @@
+import sys
+import time
+import asyncio
+import secrets
+import threading
+import traceback
+from collections import deque, Counter
+from datetime import datetime
+from typing import Optional, List
+from fastapi import APIRouter, HTTPException, Header, Query
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel
+from config import get_settings
+
+router = APIRouter()
+
+# 加载配置
+settings = get_settings()
+
+# 配置
+HEARTBEAT_INTERVAL = 0.05  # 事件循环心跳间隔（秒）
+MIN_STALL_THRESHOLD = HEARTBEAT_INTERVAL * 4  # 卡顿阈值下限，避免正常心跳被记录为卡顿
+MAX_STALL_RECORDS = 50  # 最多保留的卡顿记录数
+MAX_PROFILE_DURATION = 60  # 采样分析最长时长（秒）
+
+
+class LoopStall(BaseModel):
+    started_at: str
+    duration: float
+    stack: List[str]
+
+
+class LoopStallsResponse(BaseModel):
+    threshold: float
+    max_lag: float
+    stalls: List[LoopStall]
+
+
+class LoopMonitor:
+    """
+    事件循环卡顿检测器
+
+    事件循环中的心跳协程定期更新时间戳，独立的看门狗线程检查心跳，
+    超过阈值未更新时抓取事件循环线程当前的调用栈，定位阻塞事件循环的调用。
+    """
+
+    def __init__(self, threshold: float):
+        if threshold < MIN_STALL_THRESHOLD:
+            print(f"LOOP_STALL_THRESHOLD={threshold} 过小，已调整为 {MIN_STALL_THRESHOLD}")
+            threshold = MIN_STALL_THRESHOLD
+        self.threshold = threshold
+        self.stalls = deque(maxlen=MAX_STALL_RECORDS)
+        self.max_lag = 0.0
+        self._last_beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._current_stall: Optional[dict] = None
+
+    def start(self):
+        """在当前事件循环中启动心跳协程和看门狗线程"""
+        self._loop_thread_id = threading.get_ident()
+        self._last_beat = time.monotonic()
+        self._stopped.clear()
+        self._heartbeat_task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+
+    def stop(self):
+        """停止检测"""
+        self._stopped.set()
+        if self._heartbeat_task is not None:
+            self._heartbeat_task.cancel()
+            self._heartbeat_task = None
+
+    async def _heartbeat(self):
+        while True:
+            before = time.monotonic()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            now = time.monotonic()
+            self.max_lag = max(self.max_lag, now - before - HEARTBEAT_INTERVAL)
+            self._last_beat = now
+
+    def _watch(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            last_beat = self._last_beat
+            lag = time.monotonic() - last_beat
+
+            if lag < self.threshold:
+                # 心跳恢复，结束当前卡顿记录
+                if self._current_stall is not None:
+                    print(f"事件循环阻塞 {self._current_stall['duration']:.3f}s，调用栈:\n{''.join(self._current_stall['stack'])}")
+                    self._current_stall = None
+                continue
+
+            if self._current_stall is not None and self._current_stall["beat"] == last_beat:
+                # 同一次卡顿，只更新持续时间
+                self._current_stall["duration"] = lag
+                continue
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = traceback.format_stack(frame) if frame is not None else []
+            self._current_stall = {
+                "beat": last_beat,
+                "started_at": datetime.now().isoformat(timespec="milliseconds"),
+                "duration": lag,
+                "stack": stack,
+            }
+            self.stalls.append(self._current_stall)
+
+
+# 全局事件循环卡顿检测器
+loop_monitor = LoopMonitor(threshold=settings.LOOP_STALL_THRESHOLD)
+
+# 同一时间只允许运行一个采样分析
+_profile_lock = threading.Lock()
+
+
+# 辅助函数：校验管理员令牌
+def verify_admin_token(token: Optional[str]):
+    """校验管理员令牌，未配置ADMIN_TOKEN时禁用诊断接口"""
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(
+            status_code=403,
+            detail="诊断接口未启用，请在 .env 文件中设置 ADMIN_TOKEN"
+        )
+    if not token or not secrets.compare_digest(token.encode(), settings.ADMIN_TOKEN.encode()):
+        raise HTTPException(
+            status_code=403,
+            detail="管理员令牌无效"
+        )
+
+
+# 辅助函数：采样分析
+def sample_stacks(duration: float, interval: float) -> str:
+    """
+    定期采样所有线程的调用栈
+
+    返回折叠栈格式（每行 "线程;帧1;帧2;... 次数"），可直接用于 flamegraph.pl 或 speedscope。
+    """
+    own_thread_id = threading.get_ident()
+    thread_names = {t.ident: t.name for t in threading.enumerate()}
+    counts = Counter()
+    deadline = time.monotonic() + duration
+
+    while time.monotonic() < deadline:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})".replace(";", ":"))
+                frame = frame.f_back
+            frames.append(thread_names.get(thread_id, f"thread-{thread_id}"))
+            counts[";".join(reversed(frames))] += 1
+        time.sleep(interval)
+
+    return "\n".join(f"{stack} {count}" for stack, count in counts.most_common()) + "\n"
+
+
+# 辅助函数：独占运行采样分析
+def run_exclusive_profile(duration: float, interval: float) -> Optional[str]:
+    """
+    在工作线程内获取并释放采样锁，已有采样分析运行时返回None
+
+    锁由采样线程持有，请求被取消后采样仍在运行期间锁不会被提前释放。
+    """
+    if not _profile_lock.acquire(blocking=False):
+        return None
+    try:
+        return sample_stacks(duration, interval)
+    finally:
+        _profile_lock.release()
+
+
+@router.get("/debug/loop-stalls", response_model=LoopStallsResponse, tags=["diagnostics"])
+async def get_loop_stalls(x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")):
+    """
+    查询最近的事件循环卡顿记录（需要管理员令牌）
+
+    返回每次卡顿的开始时间、持续时间和卡顿期间事件循环线程的调用栈
+    """
+    verify_admin_token(x_admin_token)
+
+    return LoopStallsResponse(
+        threshold=loop_monitor.threshold,
+        max_lag=loop_monitor.max_lag,
+        stalls=[
+            LoopStall(started_at=s["started_at"], duration=s["duration"], stack=s["stack"])
+            for s in list(loop_monitor.stalls)
+        ]
+    )
+
+
+@router.get("/debug/profile", response_class=PlainTextResponse, tags=["diagnostics"])
+async def profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_DURATION),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    x_admin_token: Optional[str] = Header(None, alias="X-Admin-Token")
+):
+    """
+    对运行中的进程进行限时采样分析（需要管理员令牌）
+
+    参数：
+    - seconds: 采样时长（秒，最长60秒）
+    - interval_ms: 采样间隔（毫秒）
+
+    返回折叠栈格式文本，可用 flamegraph.pl 或 speedscope 生成火焰图
+    """
+    verify_admin_token(x_admin_token)
+
+    # 在线程中采样，事件循环保持运行以便采集到其调用栈
+    result = await asyncio.to_thread(run_exclusive_profile, seconds, interval_ms / 1000)
+    if result is None:
+        raise HTTPException(
+            status_code=409,
+            detail="已有采样分析正在运行"
+        )
+
+    return result
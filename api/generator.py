@@ -2,15 +2,20 @@ import os
 from http import HTTPStatus
 from dashscope import VideoSynthesis
 import dashscope
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks
+from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Header, Request
 from pydantic import BaseModel, Field
-from typing import Optional, List
+from typing import Optional, List, Dict, Tuple
 from datetime import datetime
 import uuid
+import re
+import hashlib
+import json
+import time
 from config import get_settings
 import httpx
 import asyncio
 import ffmpeg
+from concurrent.futures import ThreadPoolExecutor
 
 router = APIRouter()
 
@@ -26,10 +31,33 @@ VIDEO_DIR = "videos"
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp"}
 
+# 序列视频生成参数
+SEQUENCE_MODEL = "wan2.2-kf2v-flash"
+SEQUENCE_NEGATIVE_PROMPT = "低质量, 模糊, 畸形, 变形, 多余的肢体, 错误的解剖结构, 脸部缺陷, 文字, 水印。"
+SEQUENCE_RESOLUTION = "720P"
+SEQUENCE_PROMPT_EXTEND = True
+
+# 衍生文件配置（封面图、低码率预览、拖动预览雪碧图）
+PREVIEW_DURATION = 6  # 预览片段时长（秒）
+PREVIEW_WIDTH = 320
+SPRITE_TILE_WIDTH = 160
+SPRITE_COLUMNS = 5
+SPRITE_ROWS = 5
+DERIVATIVE_NAMES = ("poster", "preview", "sprite")
+
 # 确保上传目录存在
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(VIDEO_DIR, exist_ok=True)
 
+# 衍生文件生成线程池（延迟创建），每个任务只是启动ffmpeg子进程并等待
+_derivative_pool: Optional[ThreadPoolExecutor] = None
+# 正在生成衍生文件的任务（(合并视频路径, 衍生文件类型) -> 任务），避免同一视频重复生成
+_derivative_jobs: Dict[Tuple[str, Tuple[str, ...]], asyncio.Future] = {}
+
+# 序列任务去重：进行中的任务（请求指纹 -> 任务）和幂等键（客户端地址:幂等键 -> 请求指纹、任务、完成时间）
+_inflight_jobs: Dict[str, asyncio.Task] = {}
+_idempotency_keys: Dict[str, dict] = {}
+
 
 class VideoGenerateResponse(BaseModel):
     task_id: str
@@ -52,6 +80,20 @@ class VideoSequenceResponse(BaseModel):
     total_videos: int
     processed_videos: int = 0
     merged_video_url: Optional[str] = None
+    poster_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    sprite_url: Optional[str] = None
+
+
+class VideoDerivativesResponse(BaseModel):
+    task_id: str
+    poster_url: Optional[str] = None
+    preview_url: Optional[str] = None
+    sprite_url: Optional[str] = None
+    sprite_columns: Optional[int] = None
+    sprite_rows: Optional[int] = None
+    sprite_tile_width: Optional[int] = None
+    sprite_interval: Optional[float] = None  # 每个雪碧图格子对应的时长（秒）
 
 
 # 辅助函数：下载视频
@@ -103,6 +145,256 @@ def merge_videos(video_files: List[str], output_path: str) -> bool:
         return False
 
 
+# 辅助函数：获取衍生文件路径
+def get_derivative_paths(merged_path: str) -> dict:
+    """根据合并视频路径返回封面图、预览片段和雪碧图的路径"""
+    base = merged_path[:-len('_merged.mp4')] if merged_path.endswith('_merged.mp4') else os.path.splitext(merged_path)[0]
+    return {
+        "poster": f"{base}_poster.jpg",
+        "preview": f"{base}_preview.mp4",
+        "sprite": f"{base}_sprite.jpg",
+    }
+
+
+# 辅助函数：获取雪碧图布局信息路径
+def get_sprite_meta_path(merged_path: str) -> str:
+    """雪碧图布局信息（行列数、格子宽度、每格时长）保存在同名JSON文件中"""
+    return os.path.splitext(get_derivative_paths(merged_path)["sprite"])[0] + ".json"
+
+
+# 辅助函数：检查衍生文件是否已生成
+def derivative_exists(merged_path: str, name: str) -> bool:
+    """衍生文件存在且非空时视为已生成，雪碧图还需要布局信息文件"""
+    path = get_derivative_paths(merged_path)[name]
+    if not (os.path.exists(path) and os.path.getsize(path) > 0):
+        return False
+    if name == "sprite":
+        return os.path.exists(get_sprite_meta_path(merged_path))
+    return True
+
+
+# 辅助函数：读取雪碧图布局信息
+def load_sprite_meta(merged_path: str) -> Optional[dict]:
+    """读取雪碧图布局信息，不存在或无法读取时返回None"""
+    try:
+        with open(get_sprite_meta_path(merged_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+# 辅助函数：生成衍生文件（在线程池中运行）
+def generate_derivatives(merged_path: str, names: Tuple[str, ...] = DERIVATIVE_NAMES) -> dict:
+    """
+    为合并后的视频生成封面图、低码率预览片段和拖动预览雪碧图
+
+    已存在的衍生文件直接复用，不会重复生成。
+    返回生成成功的衍生文件路径，失败的项为None。
+    """
+    paths = get_derivative_paths(merged_path)
+    result = {name: paths[name] for name in names if derivative_exists(merged_path, name)}
+    missing = [name for name in names if name not in result]
+    if not missing:
+        return result
+
+    # 只有封面图和雪碧图需要视频时长
+    duration = None
+    if "poster" in missing or "sprite" in missing:
+        try:
+            duration = float(ffmpeg.probe(merged_path)['format']['duration'])
+        except Exception as e:
+            print(f"读取视频时长失败: {str(e)}")
+
+    for name in missing:
+        path = paths[name]
+
+        # 雪碧图每格对应的时长依赖视频时长，未知时不生成
+        if name == "sprite" and not duration:
+            print(f"视频时长未知，跳过生成雪碧图: {merged_path}")
+            result[name] = None
+            continue
+
+        # 先写入临时文件，完成后再重命名，避免暴露不完整的文件
+        root, ext = os.path.splitext(path)
+        tmp_path = f"{root}.{uuid.uuid4().hex[:8]}.tmp{ext}"
+        try:
+            if name == "poster":
+                # 取视频开头附近的一帧作为封面（避开首帧黑屏）
+                (
+                    ffmpeg
+                    .input(merged_path, ss=min(1.0, duration / 2) if duration else 0)
+                    .output(tmp_path, vframes=1, q=3)
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+            elif name == "preview":
+                (
+                    ffmpeg
+                    .input(merged_path, t=PREVIEW_DURATION)
+                    .output(
+                        tmp_path,
+                        vf=f"scale={PREVIEW_WIDTH}:-2",
+                        vcodec='libx264',
+                        crf=32,
+                        preset='veryfast',
+                        an=None,
+                        movflags='+faststart'
+                    )
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+            else:
+                # 均匀抽取帧拼成网格，用于进度条拖动预览
+                interval = duration / (SPRITE_COLUMNS * SPRITE_ROWS)
+                (
+                    ffmpeg
+                    .input(merged_path)
+                    .filter('fps', fps=1 / interval)
+                    .filter('scale', SPRITE_TILE_WIDTH, -2)
+                    .filter('tile', f"{SPRITE_COLUMNS}x{SPRITE_ROWS}")
+                    .output(tmp_path, vframes=1, q=4)
+                    .overwrite_output()
+                    .run(capture_stdout=True, capture_stderr=True)
+                )
+                with open(get_sprite_meta_path(merged_path), 'w', encoding='utf-8') as f:
+                    json.dump({
+                        "sprite_columns": SPRITE_COLUMNS,
+                        "sprite_rows": SPRITE_ROWS,
+                        "sprite_tile_width": SPRITE_TILE_WIDTH,
+                        "sprite_interval": interval,
+                    }, f)
+            os.replace(tmp_path, path)
+            result[name] = path
+        except Exception as e:
+            print(f"生成{name}失败: {str(e)}")
+            result[name] = None
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    return result
+
+
+# 辅助函数：获取衍生文件访问URL
+def get_derivative_urls(merged_path: str) -> dict:
+    """根据合并视频路径返回已生成的衍生文件的访问URL，未生成的项为None"""
+    return {
+        f"{name}_url": f"{settings.SERVER_URL}/videos/{os.path.basename(path)}"
+        if derivative_exists(merged_path, name) else None
+        for name, path in get_derivative_paths(merged_path).items()
+    }
+
+
+# 辅助函数：获取衍生文件线程池
+def _get_derivative_pool() -> ThreadPoolExecutor:
+    global _derivative_pool
+    if _derivative_pool is None:
+        _derivative_pool = ThreadPoolExecutor(
+            max_workers=settings.DERIVATIVE_WORKERS,
+            thread_name_prefix="derivatives"
+        )
+    return _derivative_pool
+
+
+# 辅助函数：衍生文件任务结束时更新记录
+def _finish_derivative_job(key: Tuple[str, Tuple[str, ...]], job: asyncio.Future):
+    """任务结束后移出进行中列表"""
+    _derivative_jobs.pop(key, None)
+    if job.cancelled():
+        return
+    error = job.exception()
+    if error is not None:
+        print(f"生成衍生文件失败: {str(error)}")
+
+
+# 辅助函数：在后台线程池中生成衍生文件
+def schedule_derivatives(merged_path: str, names: Tuple[str, ...] = DERIVATIVE_NAMES) -> asyncio.Future:
+    """
+    在后台线程池中生成衍生文件，不阻塞事件循环
+
+    同一视频的相同衍生文件正在生成时返回已有任务；调用方可以不等待结果。
+    """
+    loop = asyncio.get_running_loop()
+
+    # 衍生文件都已存在时直接返回，不占用线程池
+    if all(derivative_exists(merged_path, name) for name in names):
+        job = loop.create_future()
+        paths = get_derivative_paths(merged_path)
+        job.set_result({name: paths[name] for name in names})
+        return job
+
+    key = (merged_path, names)
+    job = _derivative_jobs.get(key)
+    if job is not None:
+        return job
+
+    job = loop.run_in_executor(
+        _get_derivative_pool(), generate_derivatives, merged_path, names
+    )
+    _derivative_jobs[key] = job
+    job.add_done_callback(lambda f: _finish_derivative_job(key, f))
+    return job
+
+
+# 辅助函数：关闭衍生文件线程池
+def shutdown_derivative_pool():
+    """关闭衍生文件生成线程池"""
+    global _derivative_pool
+    if _derivative_pool is not None:
+        _derivative_pool.shutdown(wait=False, cancel_futures=True)
+        _derivative_pool = None
+
+
+# 辅助函数：计算序列请求指纹
+def compute_sequence_fingerprint(images: List[bytes], video_prompt: str) -> str:
+    """根据关键帧内容哈希和生成参数计算请求指纹"""
+    digest = hashlib.sha256()
+    for contents in images:
+        digest.update(hashlib.sha256(contents).digest())
+    params = json.dumps(
+        {
+            "model": SEQUENCE_MODEL,
+            "prompt": video_prompt,
+            "negative_prompt": SEQUENCE_NEGATIVE_PROMPT,
+            "resolution": SEQUENCE_RESOLUTION,
+            "prompt_extend": SEQUENCE_PROMPT_EXTEND,
+        },
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    digest.update(params.encode("utf-8"))
+    return digest.hexdigest()
+
+
+# 辅助函数：清理过期的任务记录
+def prune_sequence_jobs():
+    """清理失败或超过保留时间的幂等键记录"""
+    now = time.monotonic()
+    for key, entry in list(_idempotency_keys.items()):
+        job = entry["job"]
+        if not job.done():
+            continue
+        if entry["finished_at"] is None:
+            entry["finished_at"] = now
+        if job.cancelled() or job.exception() is not None or now - entry["finished_at"] > settings.IDEMPOTENCY_TTL:
+            del _idempotency_keys[key]
+
+
+# 辅助函数：任务结束时更新记录
+def _finish_sequence_job(fingerprint: str, job: asyncio.Task):
+    """任务结束后移出进行中列表，并记录绑定到该任务的幂等键的完成时间"""
+    if _inflight_jobs.get(fingerprint) is job:
+        del _inflight_jobs[fingerprint]
+    # 所有等待的客户端都已断开时，由此处取出并记录异常
+    if not job.cancelled():
+        error = job.exception()
+        if error is not None:
+            print(f"序列任务失败: {str(error)}")
+    finished_at = time.monotonic()
+    for entry in _idempotency_keys.values():
+        if entry["job"] is job:
+            entry["finished_at"] = finished_at
+
+
 # 辅助函数：等待任务完成并获取视频URL
 async def wait_for_video(task_id: str) -> Optional[str]:
     """等待视频生成完成并返回URL"""
@@ -380,80 +672,18 @@ async def wait_completion(task_id: str):
         )
 
 
-@router.post("/generate-sequence", response_model=VideoSequenceResponse, tags=["generator"])
-async def generate_video_sequence(
-    files: List[UploadFile] = File(...),
-    prompt: Optional[str] = None,
-    background_tasks: BackgroundTasks = None
-):
-    """
-    上传多张图片生成序列视频（自动合并）
-    
-    参数：
-    - files: 1-6张图片文件（按顺序）
-    - prompt: 视频生成提示词（可选）
-    
-    说明：
-    - 上传n张图片，生成n-1个视频片段
-    - 例如：4张图片 → 3个视频（1-2, 2-3, 3-4）
-    - 所有视频自动合并成一个完整视频
-    
-    流程：
-    1. 根据图片数量生成对应数量的视频片段
-    2. 下载所有视频片段
-    3. 合并成一个完整视频
-    4. 返回合并后的视频URL
-    """
-    if not settings.DASHSCOPE_API_KEY:
-        raise HTTPException(
-            status_code=500,
-            detail="DASHSCOPE_API_KEY 未配置，请在 .env 文件中设置"
-        )
-    
-    # 检查文件数量（1-6张）
-    num_files = len(files)
-    if num_files < 1:
-        raise HTTPException(
-            status_code=400,
-            detail="至少需要上传1张图片"
-        )
-    if num_files > 6:
-        raise HTTPException(
-            status_code=400,
-            detail=f"最多支持上传6张图片，当前上传了 {num_files} 张"
-        )
-    
-    # 如果只有1张图片，无法生成视频
-    if num_files == 1:
-        raise HTTPException(
-            status_code=400,
-            detail="至少需要2张图片才能生成视频"
-        )
-    
+async def run_sequence_job(
+    sequence_task_id: str,
+    file_contents: List[Tuple[str, bytes]],
+    video_prompt: str
+) -> VideoSequenceResponse:
+    """保存图片，生成并合并序列视频"""
+    num_files = len(file_contents)
     uploaded_filenames = []
     
-    # 上传并保存所有文件
-    for idx, file in enumerate(files):
+    # 保存所有文件
+    for idx, (file_ext, contents) in enumerate(file_contents):
         try:
-            # 检查文件扩展名
-            file_ext = os.path.splitext(file.filename)[1].lower()
-            if file_ext not in ALLOWED_EXTENSIONS:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"文件 {file.filename} 格式不支持。支持的格式: {', '.join(ALLOWED_EXTENSIONS)}"
-                )
-            
-            # 读取文件内容以检查大小
-            contents = await file.read()
-            file_size = len(contents)
-            
-            # 检查文件大小
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail=f"文件 {file.filename} 大小 ({file_size / 1024 / 1024:.2f}MB) 超过限制 (10MB)"
-                )
-            
             # 生成唯一文件名
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             unique_id = str(uuid.uuid4())[:8]
@@ -465,21 +695,17 @@ async def generate_video_sequence(
                 f.write(contents)
             
             uploaded_filenames.append(safe_filename)
-            
-        except HTTPException:
-            raise
+        
         except Exception as e:
+            for filename in uploaded_filenames:
+                file_path = os.path.join(UPLOAD_DIR, filename)
+                if os.path.exists(file_path):
+                    os.remove(file_path)
             raise HTTPException(
                 status_code=500,
-                detail=f"保存文件 {file.filename} 失败: {str(e)}"
+                detail=f"保存第 {idx+1} 个文件失败: {str(e)}"
             )
     
-    # 使用默认prompt（如果未提供）
-    video_prompt = prompt if prompt else settings.DEFAULT_PROMPT
-    
-    # 生成任务ID
-    sequence_task_id = f"seq_{uuid.uuid4().hex[:16]}"
-    
     # 计算需要生成的视频数量（n张图片生成n-1个视频）
     num_videos = num_files - 1
     
@@ -498,13 +724,13 @@ async def generate_video_sequence(
             # 异步调用视频生成API
             rsp = VideoSynthesis.async_call(
                 api_key=settings.DASHSCOPE_API_KEY,
-                model="wan2.2-kf2v-flash",
+                model=SEQUENCE_MODEL,
                 prompt=video_prompt,
-                negative_prompt="低质量, 模糊, 畸形, 变形, 多余的肢体, 错误的解剖结构, 脸部缺陷, 文字, 水印。",
+                negative_prompt=SEQUENCE_NEGATIVE_PROMPT,
                 first_frame_url=first_frame_url,
                 last_frame_url=last_frame_url,
-                resolution="720P",
-                prompt_extend=True
+                resolution=SEQUENCE_RESOLUTION,
+                prompt_extend=SEQUENCE_PROMPT_EXTEND
             )
             
             if rsp.status_code == HTTPStatus.OK:
@@ -589,13 +815,26 @@ async def generate_video_sequence(
         
         print(f"序列视频生成完成: {merged_video_url}")
         
+        # 封面图只需一帧，生成完成后再返回；预览片段和雪碧图在后台生成，
+        # 完成后通过 /derivatives/{task_id} 获取。衍生文件失败不影响主视频返回
+        try:
+            await schedule_derivatives(merged_path, ("poster",))
+        except Exception as e:
+            print(f"生成封面图失败: {str(e)}")
+        try:
+            schedule_derivatives(merged_path)
+        except Exception as e:
+            print(f"调度衍生文件生成失败: {str(e)}")
+        derivative_urls = get_derivative_urls(merged_path)
+        
         return VideoSequenceResponse(
             task_id=sequence_task_id,
             status="completed",
             message=f"序列视频生成并合并完成（{num_files}张图片 → {num_videos}个视频）",
             total_videos=num_videos,
             processed_videos=num_videos,
-            merged_video_url=merged_video_url
+            merged_video_url=merged_video_url,
+            **derivative_urls
         )
     
     except HTTPException:
@@ -621,3 +860,174 @@ async def generate_video_sequence(
             status_code=500,
             detail=f"生成序列视频失败: {str(e)}"
         )
+
+
+@router.post("/generate-sequence", response_model=VideoSequenceResponse, tags=["generator"])
+async def generate_video_sequence(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    prompt: Optional[str] = None,
+    background_tasks: BackgroundTasks = None,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
+    """
+    上传多张图片生成序列视频（自动合并）
+    
+    参数：
+    - files: 1-6张图片文件（按顺序）
+    - prompt: 视频生成提示词（可选）
+    - Idempotency-Key: 请求头，幂等键（可选），重试时携带相同的键可复用原任务及其结果；
+      幂等键按客户端地址隔离，但经过代理时多个用户可能共享同一地址，建议使用UUID等全局唯一值
+    
+    说明：
+    - 上传n张图片，生成n-1个视频片段
+    - 例如：4张图片 → 3个视频（1-2, 2-3, 3-4）
+    - 所有视频自动合并成一个完整视频
+    - 返回时封面图（poster_url）已生成；预览片段和雪碧图在后台生成，返回时尚未生成的项为null，
+      可通过 /derivatives/{task_id} 等待并获取
+    - 相同图片、提示词和生成参数的请求在进行中时会复用同一个任务，不会重复提交；
+      任务完成后再次提交会重新生成，只有携带相同幂等键的重试才会返回已完成的结果
+    
+    流程：
+    1. 根据图片数量生成对应数量的视频片段
+    2. 下载所有视频片段
+    3. 合并成一个完整视频
+    4. 返回合并后的视频URL
+    """
+    if not settings.DASHSCOPE_API_KEY:
+        raise HTTPException(
+            status_code=500,
+            detail="DASHSCOPE_API_KEY 未配置，请在 .env 文件中设置"
+        )
+    
+    # 检查文件数量（1-6张）
+    num_files = len(files)
+    if num_files < 1:
+        raise HTTPException(
+            status_code=400,
+            detail="至少需要上传1张图片"
+        )
+    if num_files > 6:
+        raise HTTPException(
+            status_code=400,
+            detail=f"最多支持上传6张图片，当前上传了 {num_files} 张"
+        )
+    
+    # 如果只有1张图片，无法生成视频
+    if num_files == 1:
+        raise HTTPException(
+            status_code=400,
+            detail="至少需要2张图片才能生成视频"
+        )
+    
+    # 读取并校验所有文件
+    file_contents = []
+    
+    for file in files:
+        # 检查文件扩展名
+        file_ext = os.path.splitext(file.filename)[1].lower()
+        if file_ext not in ALLOWED_EXTENSIONS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"文件 {file.filename} 格式不支持。支持的格式: {', '.join(ALLOWED_EXTENSIONS)}"
+            )
+        
+        try:
+            # 读取文件内容以检查大小
+            contents = await file.read()
+        except Exception as e:
+            raise HTTPException(
+                status_code=500,
+                detail=f"读取文件 {file.filename} 失败: {str(e)}"
+            )
+        
+        file_size = len(contents)
+        
+        # 检查文件大小
+        if file_size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=400,
+                detail=f"文件 {file.filename} 大小 ({file_size / 1024 / 1024:.2f}MB) 超过限制 (10MB)"
+            )
+        
+        file_contents.append((file_ext, contents))
+    
+    # 使用默认prompt（如果未提供）
+    video_prompt = prompt if prompt else settings.DEFAULT_PROMPT
+    
+    fingerprint = compute_sequence_fingerprint([c for _, c in file_contents], video_prompt)
+    
+    prune_sequence_jobs()
+    
+    # 携带已使用过的幂等键时复用原任务（进行中或保留期内已完成）
+    scoped_key = None
+    if idempotency_key:
+        client_host = request.client.host if request.client else ""
+        scoped_key = f"{client_host}:{idempotency_key}"
+        entry = _idempotency_keys.get(scoped_key)
+        if entry is not None:
+            # 同一个幂等键只能用于相同的请求
+            if entry["fingerprint"] != fingerprint:
+                raise HTTPException(
+                    status_code=422,
+                    detail="Idempotency-Key 已被用于不同的请求"
+                )
+            print("幂等键已存在，复用原任务")
+            return await asyncio.shield(entry["job"])
+    
+    # 进行中的相同请求共享同一个任务
+    job = _inflight_jobs.get(fingerprint)
+    if job is None or job.done():
+        sequence_task_id = f"seq_{uuid.uuid4().hex[:16]}"
+        job = asyncio.create_task(run_sequence_job(sequence_task_id, file_contents, video_prompt))
+        _inflight_jobs[fingerprint] = job
+        job.add_done_callback(lambda t: _finish_sequence_job(fingerprint, t))
+    else:
+        print("相同请求正在处理中，等待已有任务完成")
+    
+    if scoped_key:
+        _idempotency_keys[scoped_key] = {
+            "fingerprint": fingerprint,
+            "job": job,
+            "finished_at": None,
+        }
+    
+    # 客户端断开时不取消共享任务
+    return await asyncio.shield(job)
+
+
+@router.get("/derivatives/{task_id}", response_model=VideoDerivativesResponse, tags=["generator"])
+async def get_derivatives(task_id: str):
+    """
+    获取序列视频的封面图、预览片段和雪碧图
+
+    等待衍生文件生成完成后返回URL：已存在的文件直接复用，缺失的文件按需生成，
+    也可用于为已有的合并视频补充生成衍生文件。生成失败的项返回null。
+    雪碧图按 sprite_columns × sprite_rows 网格从左到右、从上到下排列，
+    第n个格子（从0开始）对应视频第 n × sprite_interval 秒。
+    """
+    if not re.fullmatch(r"seq_[0-9a-f]{16}", task_id):
+        raise HTTPException(
+            status_code=400,
+            detail=f"无效的任务ID: {task_id}"
+        )
+
+    merged_path = os.path.join(VIDEO_DIR, f"{task_id}_merged.mp4")
+    if not os.path.exists(merged_path):
+        raise HTTPException(
+            status_code=404,
+            detail=f"任务 {task_id} 的合并视频不存在"
+        )
+
+    try:
+        # 客户端断开时不取消共享的生成任务
+        await asyncio.shield(schedule_derivatives(merged_path))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"生成衍生文件失败: {str(e)}"
+        )
+
+    urls = get_derivative_urls(merged_path)
+    sprite_meta = load_sprite_meta(merged_path) if urls["sprite_url"] else None
+    return VideoDerivativesResponse(task_id=task_id, **urls, **(sprite_meta or {}))
@@ -21,6 +21,18 @@ class Settings(BaseSettings):
     # 视频生成默认配置
     DEFAULT_PROMPT: str = "同一人物在不同时期的平滑过渡，保持面部特征一致性，背景自然变化，光影真实，色彩丰富，高质量视频。"
     
+    # 衍生文件（封面图、预览片段、雪碧图）后台生成线程数
+    DERIVATIVE_WORKERS: int = 2
+    
+    # 已完成序列任务结果的保留时间（秒），期间携带相同Idempotency-Key的重试直接复用结果
+    IDEMPOTENCY_TTL: int = 600
+    
+    # 诊断配置
+    # 事件循环阻塞超过该时长（秒）时记录调用栈（最小0.2秒）
+    LOOP_STALL_THRESHOLD: float = 0.5
+    # 管理员令牌，用于访问诊断接口（为空时禁用）
+    ADMIN_TOKEN: str = ""
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
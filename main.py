@@ -1,13 +1,24 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from api.generator import router as generator_router
+from api.generator import router as generator_router, shutdown_derivative_pool
+from api.diagnostics import router as diagnostics_router, loop_monitor
 import os
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动事件循环卡顿检测
+    loop_monitor.start()
+    yield
+    loop_monitor.stop()
+    shutdown_derivative_pool()
+
 app = FastAPI(
     title="Consistent Video Generator API",
     description="后端API服务",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS配置
@@ -29,6 +40,7 @@ app.mount("/videos", StaticFiles(directory=videos_dir), name="videos")
 
 # 注册API路由
 app.include_router(generator_router, prefix="/api/v1")
+app.include_router(diagnostics_router, prefix="/api/v1")
 
 # 生产环境：托管前端静态文件
 frontend_dist = os.path.join("web", "dist")
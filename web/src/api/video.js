@@ -8,7 +8,7 @@ const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
  * 生成序列视频 - 上传2-6张图片文件
  * @param {File[]} files - 2-6个图片文件数组
  * @param {string} prompt - 可选的提示词
- * @returns {Promise<{task_id: string, status: string, message: string, merged_video_url?: string}>}
+ * @returns {Promise<{task_id: string, status: string, message: string, merged_video_url?: string, poster_url?: string, preview_url?: string, sprite_url?: string}>}
  */
 export async function generateVideo(files, prompt = '') {
   const formData = new FormData();